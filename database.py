@@ -0,0 +1,50 @@
+from functools import lru_cache
+from io import StringIO
+from types import MappingProxyType
+import pandas as pd
+import numpy as np
+from sqlalchemy import create_engine
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Database config (dibaca sekali saat import, read-only supaya tetap sama dengan DB_URL/engine)
+DB_CONFIG = MappingProxyType({
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'coffee_shop_db'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'postgres')
+})
+
+DB_URL = (
+    f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
+    f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+)
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Shared SQLAlchemy engine (dibuat sekali, koneksi diambil dari pool)"""
+    return create_engine(DB_URL, pool_size=5, pool_pre_ping=True)
+
+def data_fingerprint(df):
+    """Fingerprint (non-kriptografis) nama + koordinat per row, dihitung vectorized"""
+    key_df = pd.DataFrame({
+        'name': df['name'].str.lower(),
+        'latitude': df['latitude'].astype(np.float64),
+        'longitude': df['longitude'].astype(np.float64)
+    })
+    hashes = pd.util.hash_pandas_object(key_df, index=False).to_numpy()
+    return [f"{h:016x}" for h in hashes.tolist()]
+
+def copy_dataframe(conn, df, table_name):
+    """Bulk insert dataframe ke table PostgreSQL via COPY (lebih cepat dari INSERT)"""
+    buffer = StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    
+    columns = ', '.join(df.columns)
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", buffer)
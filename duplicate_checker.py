@@ -1,17 +1,129 @@
 import pandas as pd
 import numpy as np
-from rapidfuzz import fuzz
+try:
+    from rapidfuzz import fuzz
+    from rapidfuzz.process import cpdist
+except ImportError:
+    # Fallback ke scorer Numba (_indel_ratio) kalau RapidFuzz tidak terinstall
+    fuzz = None
+from sklearn.neighbors import BallTree
 from math import radians, sin, cos, sqrt, atan2
-import hashlib
+from numba import njit
 import psycopg2
 from sqlalchemy import create_engine
+from database import get_engine, data_fingerprint, copy_dataframe
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from dotenv import load_dotenv
 import time
 
 # Load environment variables
 load_dotenv()
 
+EARTH_RADIUS = 6371000  # Earth radius in meters
+
+@njit(cache=True, fastmath=True)
+def _haversine_m(lat1, lon1, lat2, lon2):
+    """Haversine (meter) untuk satu pasangan koordinat, di-compile dengan Numba"""
+    lat1, lon1, lat2, lon2 = radians(lat1), radians(lon1), radians(lat2), radians(lon2)
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    
+    return EARTH_RADIUS * c
+
+def haversine_vec(lat1, lon1, lat2, lon2):
+    """Hitung jarak dalam meter untuk banyak pasangan koordinat sekaligus (input dalam radian)"""
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    
+    return EARTH_RADIUS * c
+
+def _char_codes(name):
+    """Encode nama menjadi array kode karakter (unicode code point)"""
+    return np.frombuffer(name.encode('utf-32-le'), dtype=np.uint32)
+
+@njit(cache=True)
+def _indel_ratio(a, b):
+    """Fallback fuzz.ratio (normalized Indel similarity, 0-100) untuk 2 array kode karakter"""
+    n, m = len(a), len(b)
+    if n + m == 0:
+        return 100.0
+    
+    # Panjang LCS dengan 2 baris buffer (rolling)
+    prev = np.zeros(m + 1, np.int32)
+    curr = np.zeros(m + 1, np.int32)
+    for i in range(n):
+        for j in range(m):
+            if a[i] == b[j]:
+                curr[j + 1] = prev[j] + 1
+            else:
+                curr[j + 1] = max(prev[j + 1], curr[j])
+        prev, curr = curr, prev
+    
+    return 200.0 * prev[m] / (n + m)
+
+def _pair_similarity(names, i_idx, j_idx, score_cutoff, workers=1):
+    """Similarity nama per pasangan (i, j) dengan RapidFuzz, atau fallback Numba"""
+    if fuzz is not None:
+        return cpdist(
+            names[i_idx], names[j_idx],
+            scorer=fuzz.ratio,
+            score_cutoff=score_cutoff,
+            dtype=np.float64,
+            workers=workers
+        )
+    
+    # Encode setiap nama yang terlibat cukup sekali
+    codes = {k: _char_codes(names[k]) for k in np.unique(np.concatenate([i_idx, j_idx]))}
+    return np.array(
+        [_indel_ratio(codes[i], codes[j]) for i, j in zip(i_idx, j_idx)],
+        dtype=np.float64
+    )
+
+def _score_block(rows, tree, coords_rad, lat_r, lon_r, names, name_keys,
+                 name_threshold, distance_threshold, workers=1):
+    """Cari dan skor kandidat duplicate untuk satu blok baris"""
+    # Blocking spasial: BallTree (haversine) hanya mengembalikan tetangga dalam radius threshold
+    neighbors = tree.query_radius(coords_rad[rows], r=distance_threshold / EARTH_RADIUS)
+    
+    # Kandidat = pasangan tetangga (i < j)
+    i_idx = np.repeat(rows, [len(js) for js in neighbors])
+    j_idx = np.concatenate(neighbors)
+    is_pair = j_idx > i_idx
+    i_idx, j_idx = i_idx[is_pair], j_idx[is_pair]
+    n_candidates = len(i_idx)
+    
+    # Hitung jarak koordinat semua kandidat sekaligus (Haversine, NumPy)
+    distances = haversine_vec(lat_r[i_idx], lon_r[i_idx], lat_r[j_idx], lon_r[j_idx])
+    
+    is_near = distances <= distance_threshold
+    i_idx, j_idx, distances = i_idx[is_near], j_idx[is_near], distances[is_near]
+    
+    # Nama identik (bucket yang sama) pasti similarity 100, tidak perlu fuzzy matching
+    similarity = np.full(len(i_idx), 100, dtype=np.float64)
+    is_fuzzy = name_keys[i_idx] != name_keys[j_idx]
+    
+    # Similarity nama hanya untuk kandidat berdekatan yang namanya berbeda
+    similarity[is_fuzzy] = _pair_similarity(
+        names, i_idx[is_fuzzy], j_idx[is_fuzzy], name_threshold, workers
+    )
+    
+    # Cek apakah duplicate
+    is_duplicate = similarity >= name_threshold
+    
+    return (
+        i_idx[is_duplicate], j_idx[is_duplicate],
+        similarity[is_duplicate], distances[is_duplicate],
+        n_candidates
+    )
+
 class DuplicateChecker:
     def __init__(self, db_config=None):
         """Initialize duplicate checker with database connection"""
@@ -21,20 +133,9 @@ class DuplicateChecker:
                 f"{db_config['host']}:{db_config['port']}/{db_config['database']}"
             )
         else:
-            # Try to get database config from environment
-            db_config = {
-                'host': os.getenv('DB_HOST', 'localhost'),
-                'port': os.getenv('DB_PORT', '5432'),
-                'database': os.getenv('DB_NAME', 'coffee_shop_db'),
-                'user': os.getenv('DB_USER', 'postgres'),
-                'password': os.getenv('DB_PASSWORD', 'postgres')
-            }
-            
+            # Pakai shared engine dari environment
             try:
-                self.engine = create_engine(
-                    f"postgresql://{db_config['user']}:{db_config['password']}@"
-                    f"{db_config['host']}:{db_config['port']}/{db_config['database']}"
-                )
+                self.engine = get_engine()
                 print("✅ Database connection established")
             except Exception as e:
                 print(f"⚠️  Database connection failed: {e}")
@@ -43,124 +144,140 @@ class DuplicateChecker:
         # Threshold untuk duplicate detection
         self.name_similarity_threshold = 85  # 85% similarity
         self.distance_threshold = 50  # 50 meter
+        self.block_size = 5000  # baris per blok untuk scoring paralel
         
     def calculate_similarity(self, name1, name2):
         """Hitung similarity score antara 2 nama menggunakan RapidFuzz"""
+        if fuzz is None:
+            return _indel_ratio(_char_codes(name1.lower()), _char_codes(name2.lower()))
         return fuzz.ratio(name1.lower(), name2.lower())
     
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Hitung jarak dalam meter menggunakan Haversine formula"""
-        R = 6371000  # Earth radius in meters
-        
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        distance = R * c
-        
-        return distance
+        return _haversine_m(float(lat1), float(lon1), float(lat2), float(lon2))
     
     def generate_data_hash(self, name, lat, lon):
         """Generate hash untuk deteksi duplicate"""
-        data_string = f"{name.lower()}_{lat}_{lon}"
-        return hashlib.md5(data_string.encode()).hexdigest()
+        row = pd.DataFrame({'name': [name], 'latitude': [lat], 'longitude': [lon]})
+        return data_fingerprint(row)[0]
     
     def detect_duplicates(self, df):
         """Deteksi duplicate dalam dataframe"""
-        duplicates = []
         total_comparisons = len(df) * (len(df) - 1) // 2
         print(f"🔍 Checking {total_comparisons} combinations...")
         
         start_time = time.time()
-        comparisons = 0
         
-        for i in range(len(df)):
-            for j in range(i + 1, len(df)):
-                comparisons += 1
-                row1 = df.iloc[i]
-                row2 = df.iloc[j]
-                
-                # Hitung similarity nama (RapidFuzz - lebih cepat)
-                name_similarity = self.calculate_similarity(
-                    row1['name'], row2['name']
-                )
-                
-                # Hitung jarak koordinat (Haversine - lebih cepat)
-                distance = self.calculate_distance(
-                    row1['latitude'], row1['longitude'],
-                    row2['latitude'], row2['longitude']
-                )
-                
-                # Cek apakah duplicate
-                is_duplicate = (
-                    name_similarity >= self.name_similarity_threshold and
-                    distance <= self.distance_threshold
-                )
-                
-                if is_duplicate:
-                    duplicate_info = {
-                        'location_1': {
-                            'id': row1.get('id', i),
-                            'name': row1['name'],
-                            'coordinates': (row1['latitude'], row1['longitude'])
-                        },
-                        'location_2': {
-                            'id': row2.get('id', j),
-                            'name': row2['name'],
-                            'coordinates': (row2['latitude'], row2['longitude'])
-                        },
-                        'similarity_score': name_similarity,
-                        'distance_meters': round(distance, 2)
-                    }
-                    duplicates.append(duplicate_info)
-                    
-                    print(f"🚨 DUPLICATE FOUND:")
-                    print(f"   {row1['name']} vs {row2['name']}")
-                    print(f"   Similarity: {name_similarity}%")
-                    print(f"   Distance: {distance:.1f}m")
-                    print()
-                
-                # Progress indicator untuk dataset besar
-                if comparisons % 100 == 0:
-                    elapsed = time.time() - start_time
-                    rate = comparisons / elapsed if elapsed > 0 else 0
-                    print(f"⏳ Progress: {comparisons}/{total_comparisons} ({rate:.0f} comparisons/sec)")
+        # Data kosong: BallTree tidak bisa dibangun tanpa sample, langsung return hasil kosong
+        if len(df) == 0:
+            return pd.DataFrame({
+                'i': np.empty(0, dtype=np.int64),
+                'j': np.empty(0, dtype=np.int64),
+                'similarity_score': np.empty(0, dtype=np.float64),
+                'distance_meters': np.empty(0, dtype=np.float64)
+            })
+        
+        # Konversi ke radian cukup sekali, dipakai BallTree dan Haversine
+        coords_rad = np.radians(df[['latitude', 'longitude']].to_numpy(dtype=np.float64))
+        lat_r, lon_r = coords_rad[:, 0], coords_rad[:, 1]
+        tree = BallTree(coords_rad, metric='haversine')
+        names = df['name'].str.lower().to_numpy()
+        
+        # Hash bucket nama (lowercase): nama identik mendapat key yang sama
+        name_keys = pd.factorize(names)[0]
+        
+        score_block = partial(
+            _score_block,
+            tree=tree, coords_rad=coords_rad, lat_r=lat_r, lon_r=lon_r,
+            names=names, name_keys=name_keys,
+            name_threshold=self.name_similarity_threshold,
+            distance_threshold=self.distance_threshold
+        )
+        
+        # Dataset kecil: 1 blok saja (RapidFuzz multi-thread). Dataset besar: blok paralel,
+        # BallTree query & RapidFuzz melepas GIL sehingga thread jalan bersamaan
+        n_blocks = min(os.cpu_count() or 1, max(1, len(df) // self.block_size))
+        if n_blocks == 1:
+            results = [score_block(np.arange(len(df)), workers=-1)]
+        else:
+            blocks = np.array_split(np.arange(len(df)), n_blocks)
+            with ThreadPoolExecutor(max_workers=n_blocks) as executor:
+                results = list(executor.map(score_block, blocks))
+        
+        i_dup, j_dup, similarity, distances, n_candidates = zip(*results)
+        i_dup, j_dup = np.concatenate(i_dup), np.concatenate(j_dup)
+        similarity, distances = np.concatenate(similarity), np.concatenate(distances)
+        comparisons = sum(n_candidates)
+        
+        # Hasil hanya menyimpan posisi baris + skor; nama/koordinat diambil dari df saat ditampilkan
+        duplicates = pd.DataFrame({
+            'i': i_dup,
+            'j': j_dup,
+            'similarity_score': similarity,
+            'distance_meters': np.round(distances, 2)
+        })
+        
+        # Laporan dibangun dulu lalu di-print sekali (bukan print per baris di dalam loop)
+        display = self.to_display(df, duplicates)
+        report = [
+            f"🚨 DUPLICATE FOUND:\n"
+            f"   {name1} vs {name2}\n"
+            f"   Similarity: {name_similarity}%\n"
+            f"   Distance: {distance:.1f}m\n"
+            for name1, name2, name_similarity, distance in zip(
+                display['name_1'], display['name_2'], similarity, distances
+            )
+        ]
+        if report:
+            print("\n".join(report))
         
         end_time = time.time()
         print(f"⏱️  Analysis completed in {end_time - start_time:.2f} seconds")
-        print(f"🔢 Total comparisons: {comparisons}")
+        print(f"🔢 Candidate pairs (within {self.distance_threshold}m): {comparisons}")
         
         return duplicates
     
-    def log_duplicates_to_db(self, duplicates):
+    def to_display(self, df, duplicates):
+        """Ambil nama & koordinat pasangan duplicate dari dataframe (untuk print/log)"""
+        loc1 = df.iloc[duplicates['i'].to_numpy()]
+        loc2 = df.iloc[duplicates['j'].to_numpy()]
+        
+        return pd.DataFrame({
+            'name_1': loc1['name'].to_numpy(),
+            'name_2': loc2['name'].to_numpy(),
+            'coordinates_1': list(zip(loc1['latitude'], loc1['longitude'])),
+            'coordinates_2': list(zip(loc2['latitude'], loc2['longitude'])),
+            'similarity_score': duplicates['similarity_score'].to_numpy(),
+            'distance_meters': duplicates['distance_meters'].to_numpy()
+        })
+    
+    def log_duplicates_to_db(self, df, duplicates):
         """Log duplicate detection results to database"""
-        if self.engine is None or not duplicates:
+        if self.engine is None or duplicates.empty:
             return
             
         try:
             with self.engine.connect() as conn:
                 from sqlalchemy import text
                 
-                # Insert duplicate log records 
-                for dup in duplicates:
-                    name1 = dup['location_1']['name']
-                    name2 = dup['location_2']['name']
-                    
+                # Insert duplicate log records (1 executemany, bukan 1 query per duplicate)
+                display = self.to_display(df, duplicates)
+                for name1, name2 in zip(display['name_1'], display['name_2']):
                     print(f"🔍 Logging duplicate: '{name1}' vs '{name2}'")
-                    
-                    conn.execute(text("""
-                        INSERT INTO duplicate_log 
-                        (location_id_1, location_id_2, similarity_score, distance_meters, action_taken)
-                        VALUES (:loc1, :loc2, :similarity, :distance, :action)
-                    """), {
-                        'loc1': name1,
-                        'loc2': name2,
-                        'similarity': float(dup['similarity_score']),
-                        'distance': float(dup['distance_meters']),
-                        'action': 'removed_duplicate'
-                    })
+                
+                rows = pd.DataFrame({
+                    'loc1': display['name_1'],
+                    'loc2': display['name_2'],
+                    'similarity': display['similarity_score'].astype(float),
+                    'distance': display['distance_meters'].astype(float),
+                    'action': 'removed_duplicate'
+                }).to_dict('records')
+                
+                conn.execute(text("""
+                    INSERT INTO duplicate_log 
+                    (location_id_1, location_id_2, similarity_score, distance_meters, action_taken)
+                    VALUES (:loc1, :loc2, :similarity, :distance, :action)
+                """), rows)
                 
                 conn.commit()
                 print(f"📝 Logged {len(duplicates)} duplicate detections to database")
@@ -172,60 +289,50 @@ class DuplicateChecker:
         """Hapus duplicate dari dataframe"""
         print(f"🧹 Cleaning {len(duplicates)} duplicates...")
         
-        # Simpan ID yang akan dihapus
-        ids_to_remove = set()
+        # Simpan ID yang akan dihapus (pilih yang kedua dari tiap pasangan)
+        ids = df['id'].to_numpy()
+        ids_to_remove = ids[duplicates['j'].to_numpy()]
         
-        for dup in duplicates:
-            # Pilih yang akan dihapus (biasanya yang kedua)
-            id_to_remove = dup['location_2']['id']
-            ids_to_remove.add(id_to_remove)
-            
-            print(f"❌ Removing: {dup['location_2']['name']}")
+        for name in df['name'].to_numpy()[duplicates['j'].to_numpy()]:
+            print(f"❌ Removing: {name}")
         
-        # Filter dataframe
-        cleaned_df = df[~df.index.isin(ids_to_remove)].copy()
+        # Filter dataframe berdasarkan kolom id (bukan index)
+        cleaned_df = df[~np.isin(ids, ids_to_remove)].copy()
         
         print(f"✅ Cleaned data: {len(df)} → {len(cleaned_df)} locations")
         return cleaned_df
     
     def regenerate_related_data(self, df, conn):
         """Regenerate data untuk table prices dan social_metrics"""
-        import random
         from datetime import datetime
-        from sqlalchemy import text
         
         print("🔄 Regenerating related data...")
         
-        # Generate prices data
-        prices_data = []
-        for _, row in df.iterrows():
-            price_per_sqm = random.randint(150000, 400000)
-            monthly_rent = price_per_sqm * row['area_sqm']
-            prices_data.append({
-                'location_id': row['id'],
-                'monthly_rent': monthly_rent,
-                'price_per_sqm': price_per_sqm,
-                'date_recorded': datetime.now().date(),
-                'source': 'regenerated'
-            })
+        # Semua kolom di-generate sekaligus (NumPy), tanpa iterrows
+        n = len(df)
+        now = datetime.now()
         
-        prices_df = pd.DataFrame(prices_data)
-        prices_df.to_sql('prices', self.engine, if_exists='append', index=False)
+        # Generate prices data
+        price_per_sqm = np.random.randint(150000, 400001, n)
+        prices_df = pd.DataFrame({
+            'location_id': df['id'].to_numpy(),
+            'monthly_rent': price_per_sqm * df['area_sqm'].to_numpy(),
+            'price_per_sqm': price_per_sqm,
+            'date_recorded': now.date(),
+            'source': 'regenerated'
+        })
+        copy_dataframe(conn, prices_df, 'prices')
         print(f"💾 Inserted {len(prices_df)} price records")
         
         # Generate social metrics data
-        social_data = []
-        for _, row in df.iterrows():
-            social_data.append({
-                'location_id': row['id'],
-                'platform': 'instagram',
-                'followers': row['followers'],
-                'engagement_rate': round(random.uniform(2.0, 8.0), 2),
-                'last_updated': datetime.now()
-            })
-        
-        social_df = pd.DataFrame(social_data)
-        social_df.to_sql('social_metrics', self.engine, if_exists='append', index=False)
+        social_df = pd.DataFrame({
+            'location_id': df['id'].to_numpy(),
+            'platform': 'instagram',
+            'followers': df['followers'].to_numpy(),
+            'engagement_rate': np.round(np.random.uniform(2.0, 8.0, n), 2),
+            'last_updated': now
+        })
+        copy_dataframe(conn, social_df, 'social_metrics')
         print(f"💾 Inserted {len(social_df)} social metrics records")
     
     def save_to_database(self, df, duplicates=None, table_name='locations'):
@@ -236,25 +343,20 @@ class DuplicateChecker:
             return
         
         try:
-            # Generate data hash untuk setiap row
-            df['data_hash'] = df.apply(
-                lambda row: self.generate_data_hash(
-                    row['name'], row['latitude'], row['longitude']
-                ), axis=1
-            )
+            # Generate data hash untuk setiap row (vectorized, tanpa df.apply)
+            df['data_hash'] = data_fingerprint(df)
             
-            # Clear existing data dan insert cleaned data
-            with self.engine.connect() as conn:
+            # Clear existing data dan insert cleaned data (1 transaksi, commit sekali di akhir)
+            with self.engine.begin() as conn:
                 from sqlalchemy import text
                 
-                # Delete existing data (handle foreign key constraints)
-                conn.execute(text("DELETE FROM prices"))
-                conn.execute(text("DELETE FROM social_metrics"))
-                conn.execute(text(f"DELETE FROM {table_name}"))
-                conn.commit()
+                # Kosongkan table sekaligus (duplicate_log tetap disimpan)
+                conn.execute(text(
+                    f"TRUNCATE {table_name}, prices, social_metrics RESTART IDENTITY CASCADE"
+                ))
                 
-                # Insert cleaned data
-                df.to_sql(table_name, self.engine, if_exists='append', index=False)
+                # Insert cleaned data (COPY, di transaksi yang sama dengan TRUNCATE)
+                copy_dataframe(conn, df, table_name)
                 print(f"💾 Replaced database with {len(df)} cleaned locations")
                 
                 # Regenerate data untuk table lain
@@ -285,12 +387,12 @@ def main():
     # Detect duplicates
     duplicates = checker.detect_duplicates(df)
     
-    if duplicates:
+    if not duplicates.empty:
         print(f"\n🎯 Found {len(duplicates)} potential duplicates")
         print("🧹 Auto-cleaning duplicates...")
         
          # Log duplicates to database
-        checker.log_duplicates_to_db(duplicates)
+        checker.log_duplicates_to_db(df, duplicates)
         
         # clean duplicates
         cleaned_df = checker.clean_duplicates(df, duplicates)
@@ -1,11 +1,8 @@
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
-import hashlib
-from sqlalchemy import create_engine
-import os
+from datetime import datetime
 from dotenv import load_dotenv
+from database import get_engine, data_fingerprint, copy_dataframe
 
 # Load environment variables
 load_dotenv()
@@ -31,38 +28,31 @@ def generate_coffee_shop_data(n_shops=50):
         {"name": "Pondok Indah", "lat": -6.2600, "lon": 106.7800}
     ]
     
-    data = []
-    
-    # Generate normal data
-    for i in range(n_shops - 10):  # Leave space for duplicates
-        chain = random.choice(coffee_chains)
-        area = random.choice(jakarta_areas)
-        
-        # Add some variation to coordinates (within 1km radius)
-        lat_variation = random.uniform(-0.01, 0.01)
-        lon_variation = random.uniform(-0.01, 0.01)
-        
-        # Generate realistic data (matching database schema)
-        shop_data = {
-            'id': i + 1,
-            'name': f"{chain} {area['name']}",
-            'latitude': area['lat'] + lat_variation,
-            'longitude': area['lon'] + lon_variation,
-            'address': f"Jl. {area['name']} No. {random.randint(1, 200)}",
-            'area_sqm': random.randint(50, 200),
-            'rating': round(random.uniform(3.5, 5.0), 1),
-            'followers': random.randint(5000, 50000),
-            'created_at': datetime.now() - timedelta(days=random.randint(1, 365))
-        }
-        
-        # Generate price data
-        price_per_sqm = random.randint(150000, 400000)
-        monthly_rent = price_per_sqm * shop_data['area_sqm']
-        
-        # Generate social metrics
-        engagement_rate = round(random.uniform(2.0, 8.0), 2)
-        
-        data.append(shop_data)
+    # Generate normal data (semua kolom sekaligus dengan NumPy)
+    n = max(n_shops - 10, 0)  # Leave space for duplicates
+    rng = np.random.default_rng()
+    now = np.datetime64(datetime.now())  # base timestamp, sekali per generate
+    
+    chain_idx = rng.integers(0, len(coffee_chains), n)
+    area_idx = rng.integers(0, len(jakarta_areas), n)
+    chain_names = np.array(coffee_chains, dtype=object)[chain_idx]
+    area_names = np.array([area['name'] for area in jakarta_areas], dtype=object)[area_idx]
+    area_lats = np.array([area['lat'] for area in jakarta_areas])[area_idx]
+    area_lons = np.array([area['lon'] for area in jakarta_areas])[area_idx]
+    
+    # Generate realistic data (matching database schema)
+    # Koordinat diberi variasi (within 1km radius)
+    normal_df = pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'name': chain_names + ' ' + area_names,
+        'latitude': area_lats + rng.uniform(-0.01, 0.01, n),
+        'longitude': area_lons + rng.uniform(-0.01, 0.01, n),
+        'address': 'Jl. ' + area_names + ' No. ' + rng.integers(1, 201, n).astype(str),
+        'area_sqm': rng.integers(50, 201, n),
+        'rating': np.round(rng.uniform(3.5, 5.0, n), 1),
+        'followers': rng.integers(5000, 50001, n),
+        'created_at': now - rng.integers(1, 366, n).astype('timedelta64[D]')
+    })
     
     # Generate intentional duplicates
     duplicate_pairs = [
@@ -88,117 +78,93 @@ def generate_coffee_shop_data(n_shops=50):
         }
     ]
     
-    # Add duplicates
-    for i, pair in enumerate(duplicate_pairs):
-        # Original
-        orig_data = {
-            'id': len(data) + 1,
-            'name': pair['original']['name'],
-            'latitude': pair['original']['lat'],
-            'longitude': pair['original']['lon'],
-            'address': f"Jl. {random.choice(['Sudirman', 'Thamrin', 'Kemang', 'Menteng'])} No. {random.randint(1, 200)}",
-            'area_sqm': random.randint(80, 150),
-            'rating': round(random.uniform(4.0, 5.0), 1),
-            'followers': random.randint(10000, 30000),
-            'created_at': datetime.now() - timedelta(days=random.randint(1, 365))
-        }
-        data.append(orig_data)
-        
-        # Duplicate
-        dup_data = {
-            'id': len(data) + 1,
-            'name': pair['duplicate']['name'],
-            'latitude': pair['duplicate']['lat'],
-            'longitude': pair['duplicate']['lon'],
-            'address': f"Jl. {random.choice(['Sudirman', 'Thamrin', 'Kemang', 'Menteng'])} No. {random.randint(1, 200)}",
-            'area_sqm': orig_data['area_sqm'] + random.randint(-10, 10),  # Slightly different
-            'rating': orig_data['rating'] + random.uniform(-0.2, 0.2),
-            'followers': orig_data['followers'] + random.randint(-5000, 5000),
-            'created_at': datetime.now() - timedelta(days=random.randint(1, 365))
-        }
-        data.append(dup_data)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
-    
-    # Shuffle data
-    df = df.sample(frac=1).reset_index(drop=True)
+    # Add duplicates (original & duplicate berselang-seling, semua kolom sekaligus)
+    k = len(duplicate_pairs)
+    dup_names = np.array(
+        [pair[role]['name'] for pair in duplicate_pairs for role in ('original', 'duplicate')],
+        dtype=object
+    )
+    dup_lats = np.array([pair[role]['lat'] for pair in duplicate_pairs for role in ('original', 'duplicate')])
+    dup_lons = np.array([pair[role]['lon'] for pair in duplicate_pairs for role in ('original', 'duplicate')])
+    street_names = np.array(['Sudirman', 'Thamrin', 'Kemang', 'Menteng'], dtype=object)
+    
+    orig_area = rng.integers(80, 151, k)
+    orig_rating = np.round(rng.uniform(4.0, 5.0, k), 1)
+    orig_followers = rng.integers(10000, 30001, k)
+    
+    dup_df = pd.DataFrame({
+        'id': np.arange(n + 1, n + 2 * k + 1),
+        'name': dup_names,
+        'latitude': dup_lats,
+        'longitude': dup_lons,
+        'address': 'Jl. ' + street_names[rng.integers(0, len(street_names), 2 * k)]
+                   + ' No. ' + rng.integers(1, 201, 2 * k).astype(str),
+        # Duplicate sedikit berbeda dari original-nya
+        'area_sqm': np.column_stack([orig_area, orig_area + rng.integers(-10, 11, k)]).ravel(),
+        'rating': np.column_stack([orig_rating, orig_rating + rng.uniform(-0.2, 0.2, k)]).ravel(),
+        'followers': np.column_stack([orig_followers, orig_followers + rng.integers(-5000, 5001, k)]).ravel(),
+        'created_at': now - rng.integers(1, 366, 2 * k).astype('timedelta64[D]')
+    })
+    
+    # Gabungkan data normal dengan duplicates, shuffle lewat satu permutation per kolom
+    order = rng.permutation(len(normal_df) + len(dup_df))
+    df = pd.DataFrame({
+        column: np.concatenate([normal_df[column].to_numpy(), dup_df[column].to_numpy()])[order]
+        for column in normal_df.columns
+    })
     
     # Reassign IDs
-    df['id'] = range(1, len(df) + 1)
+    df['id'] = np.arange(1, len(df) + 1)
     
     return df
 
 def save_to_database(df, table_name='locations'):
     """Save generated data to database"""
-    # Try to get database config from environment
-    db_config = {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'port': os.getenv('DB_PORT', '5432'),
-        'database': os.getenv('DB_NAME', 'coffee_shop_db'),
-        'user': os.getenv('DB_USER', 'postgres'),
-        'password': os.getenv('DB_PASSWORD', 'password')
-    }
-    
     try:
-        # Create database connection
-        engine = create_engine(
-            f"postgresql://{db_config['user']}:{db_config['password']}@"
-            f"{db_config['host']}:{db_config['port']}/{db_config['database']}"
-        )
+        # Shared database engine
+        engine = get_engine()
         
-        # Generate data hash untuk setiap row
-        df['data_hash'] = df.apply(
-            lambda row: hashlib.md5(
-                f"{row['name'].lower()}_{row['latitude']}_{row['longitude']}".encode()
-            ).hexdigest(), axis=1
-        )
+        # Generate data hash untuk setiap row (vectorized, sama dengan duplicate_checker)
+        df['data_hash'] = data_fingerprint(df)
         
-        # Clear existing data dan insert new data
-        with engine.connect() as conn:
+        # Clear existing data dan insert new data (satu transaksi, COPY FROM STDIN)
+        with engine.begin() as conn:
             from sqlalchemy import text
             
-            # Delete existing data from all tables
-            conn.execute(text("DELETE FROM prices"))
-            conn.execute(text("DELETE FROM social_metrics"))
-            conn.execute(text("DELETE FROM duplicate_log"))
-            conn.execute(text(f"DELETE FROM {table_name}"))
-            conn.commit()
+            # Clear existing data from all tables (satu TRUNCATE, reset SERIAL ids)
+            conn.execute(text(
+                f"TRUNCATE prices, social_metrics, duplicate_log, {table_name} RESTART IDENTITY CASCADE"
+            ))
             
             # Insert locations
-            df.to_sql(table_name, engine, if_exists='append', index=False)
+            copy_dataframe(conn, df, table_name)
             print(f"💾 Inserted {len(df)} locations to database")
             
-            # Insert prices data
-            prices_data = []
-            for _, row in df.iterrows():
-                price_per_sqm = random.randint(150000, 400000)
-                monthly_rent = price_per_sqm * row['area_sqm']
-                prices_data.append({
-                    'location_id': row['id'],
-                    'monthly_rent': monthly_rent,
-                    'price_per_sqm': price_per_sqm,
-                    'date_recorded': datetime.now().date(),
-                    'source': 'generated'
-                })
+            # Kolom prices & social metrics di-generate sekaligus (NumPy), tanpa iterrows
+            n = len(df)
+            now = datetime.now()
             
-            prices_df = pd.DataFrame(prices_data)
-            prices_df.to_sql('prices', engine, if_exists='append', index=False)
+            # Insert prices data
+            price_per_sqm = np.random.randint(150000, 400001, n)
+            prices_df = pd.DataFrame({
+                'location_id': df['id'].to_numpy(),
+                'monthly_rent': price_per_sqm * df['area_sqm'].to_numpy(),
+                'price_per_sqm': price_per_sqm,
+                'date_recorded': now.date(),
+                'source': 'generated'
+            })
+            copy_dataframe(conn, prices_df, 'prices')
             print(f"💾 Inserted {len(prices_df)} price records")
             
             # Insert social metrics data
-            social_data = []
-            for _, row in df.iterrows():
-                social_data.append({
-                    'location_id': row['id'],
-                    'platform': 'instagram',
-                    'followers': row['followers'],
-                    'engagement_rate': round(random.uniform(2.0, 8.0), 2),
-                    'last_updated': datetime.now()
-                })
-            
-            social_df = pd.DataFrame(social_data)
-            social_df.to_sql('social_metrics', engine, if_exists='append', index=False)
+            social_df = pd.DataFrame({
+                'location_id': df['id'].to_numpy(),
+                'platform': 'instagram',
+                'followers': df['followers'].to_numpy(),
+                'engagement_rate': np.round(np.random.uniform(2.0, 8.0, n), 2),
+                'last_updated': now
+            })
+            copy_dataframe(conn, social_df, 'social_metrics')
             print(f"💾 Inserted {len(social_df)} social metrics records")
             
         return True
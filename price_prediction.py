@@ -1,12 +1,12 @@
 import pandas as pd
 import numpy as np
-from sklearn.neighbors import KNeighborsRegressor
+from sklearn.neighbors import KNeighborsRegressor, NearestNeighbors
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 import os
-from sqlalchemy import create_engine
+from database import get_engine
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -16,6 +16,7 @@ class PricePredictor:
     def __init__(self, model_path='./models/'):
         """Initialize price predictor"""
         self.model = None
+        self.nn_index = None
         self.scaler = StandardScaler()
         self.feature_columns = ['latitude', 'longitude', 'area_sqm', 'rating', 'location_followers', 'engagement_rate']
         self.model_path = model_path
@@ -26,31 +27,22 @@ class PricePredictor:
     def get_data_from_database(self):
         """Ambil data dari database dengan join table"""
         try:
-            # Database config
-            db_config = {
-                'host': os.getenv('DB_HOST', 'localhost'),
-                'port': os.getenv('DB_PORT', '5432'),
-                'database': os.getenv('DB_NAME', 'coffee_shop_db'),
-                'user': os.getenv('DB_USER', 'postgres'),
-                'password': os.getenv('DB_PASSWORD', 'postgres')
-            }
+            engine = get_engine()
             
-            engine = create_engine(
-                f"postgresql://{db_config['user']}:{db_config['password']}@"
-                f"{db_config['host']}:{db_config['port']}/{db_config['database']}"
-            )
-            
-            # Join locations dengan prices
+            # Join + agregasi di server, hanya kolom yang dipakai model
             query = """
             SELECT l.id, l.name, l.latitude, l.longitude, l.area_sqm, l.rating, 
-                   l.followers as location_followers, p.price_per_sqm, p.monthly_rent, 
-                   s.followers as social_followers, s.engagement_rate
+                   l.followers as location_followers, AVG(p.price_per_sqm) as price_per_sqm, 
+                   COALESCE(AVG(s.engagement_rate), 5.0) as engagement_rate
             FROM locations l
             LEFT JOIN prices p ON l.id = p.location_id
             LEFT JOIN social_metrics s ON l.id = s.location_id
+            GROUP BY l.id
             """
             
-            df = pd.read_sql(query, engine)
+            # Dtype langsung ditentukan, pandas tidak perlu inference
+            feature_dtypes = {column: 'float32' for column in self.feature_columns}
+            df = pd.read_sql(query, engine, dtype={**feature_dtypes, 'price_per_sqm': 'float32'})
             print(f"📊 Loaded {len(df)} records from database")
             return df
             
@@ -67,13 +59,14 @@ class PricePredictor:
             print("💰 Generating price_per_sqm data...")
             df['price_per_sqm'] = np.random.randint(150000, 400000, len(df))
         
-        # Select features dan target
-        X = df[self.feature_columns].values
-        y = df['price_per_sqm'].values
+        # Select features dan target (float32, contiguous)
+        # (selalu satu copy: kolom yang sudah float32 bisa berupa view read-only dari DataFrame)
+        X = np.array(df[self.feature_columns], dtype=np.float32, order='C')
+        y = df['price_per_sqm'].to_numpy(dtype=np.float32, copy=True)
         
-        # Handle missing values
-        X = np.nan_to_num(X, nan=0)
-        y = np.nan_to_num(y, nan=0)
+        # Handle missing values (in-place, tanpa alokasi array baru)
+        np.nan_to_num(X, copy=False, nan=0.0)
+        np.nan_to_num(y, copy=False, nan=0.0)
         
         print(f"📊 Features: {X.shape}")
         print(f"📊 Target: {y.shape}")
@@ -90,13 +83,23 @@ class PricePredictor:
         )
         
         # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        # (X_train/X_test hasil split adalah copy, aman di-scale in-place)
+        self.scaler.fit(X_train)
+        self.scaler.mean_ = self.scaler.mean_.astype(np.float32)
+        self.scaler.scale_ = self.scaler.scale_.astype(np.float32)
+        X_train_scaled = self.scaler.transform(X_train, copy=False)
+        X_test_scaled = self.scaler.transform(X_test, copy=False)
         
         # Train model
-        self.model = KNeighborsRegressor(n_neighbors=n_neighbors)
+        # KD-tree: 6 fitur, query O(log n) bukan brute force
+        self.model = KNeighborsRegressor(n_neighbors=n_neighbors, algorithm='kd_tree', leaf_size=32)
         self.model.fit(X_train_scaled, y_train)
         
+        # Index similarity search terpisah (tanpa target), di-fit ke semua rows
+        # supaya indices langsung sesuai dengan urutan data input
+        self.nn_index = NearestNeighbors(n_neighbors=n_neighbors, algorithm='kd_tree', leaf_size=40)
+        self.nn_index.fit(self.scaler.transform(X))
+        
         # Evaluate model
         y_pred = self.model.predict(X_test_scaled)
         mae = mean_absolute_error(y_test, y_pred)
@@ -108,14 +111,18 @@ class PricePredictor:
         
         return self.model
     
+    def _scale_single(self, *features):
+        """Scale satu row input langsung dari mean/scale scaler (tanpa overhead transform)"""
+        new_data = np.array([features], dtype=np.float64)
+        return (new_data - self.scaler.mean_) / self.scaler.scale_
+    
     def predict_price(self, latitude, longitude, area_sqm, rating, followers, engagement_rate=5.0):
         """Predict price untuk lokasi baru"""
         if self.model is None:
             raise ValueError("Model belum di-train! Jalankan train_model() dulu.")
         
         # Prepare input data (6 features)
-        new_data = np.array([[latitude, longitude, area_sqm, rating, followers, engagement_rate]])
-        new_data_scaled = self.scaler.transform(new_data)
+        new_data_scaled = self._scale_single(latitude, longitude, area_sqm, rating, followers, engagement_rate)
         
         # Predict
         predicted_price = self.model.predict(new_data_scaled)[0]
@@ -124,15 +131,14 @@ class PricePredictor:
     
     def find_similar_locations(self, latitude, longitude, area_sqm, rating, followers, engagement_rate=5.0, n_neighbors=5):
         """Cari lokasi yang mirip"""
-        if self.model is None:
+        if self.nn_index is None:
             raise ValueError("Model belum di-train!")
         
         # Prepare input data (6 features)
-        new_data = np.array([[latitude, longitude, area_sqm, rating, followers, engagement_rate]])
-        new_data_scaled = self.scaler.transform(new_data)
+        new_data_scaled = self._scale_single(latitude, longitude, area_sqm, rating, followers, engagement_rate)
         
-        # Find nearest neighbors
-        distances, indices = self.model.kneighbors(new_data_scaled)
+        # Find nearest neighbors (indices sesuai urutan rows data training)
+        distances, indices = self.nn_index.kneighbors(new_data_scaled, n_neighbors=n_neighbors)
         
         return distances[0], indices[0]
     
@@ -144,17 +150,22 @@ class PricePredictor:
         
         model_file = os.path.join(self.model_path, filename)
         scaler_file = os.path.join(self.model_path, 'scaler.pkl')
+        nn_index_file = os.path.join(self.model_path, 'nn_index.pkl')
         
-        joblib.dump(self.model, model_file)
-        joblib.dump(self.scaler, scaler_file)
+        # LZ4: kompresi cepat, file jauh lebih kecil (butuh package lz4)
+        joblib.dump(self.model, model_file, compress=('lz4', 3))
+        joblib.dump(self.scaler, scaler_file, compress=('lz4', 3))
+        joblib.dump(self.nn_index, nn_index_file, compress=('lz4', 3))
         
         print(f"💾 Model saved to {model_file}")
         print(f"💾 Scaler saved to {scaler_file}")
+        print(f"💾 Similarity index saved to {nn_index_file}")
     
     def load_model(self, filename='knn_price_model.pkl'):
         """Load trained model"""
         model_file = os.path.join(self.model_path, filename)
         scaler_file = os.path.join(self.model_path, 'scaler.pkl')
+        nn_index_file = os.path.join(self.model_path, 'nn_index.pkl')
         
         if not os.path.exists(model_file):
             print("❌ Model file not found!")
@@ -163,6 +174,13 @@ class PricePredictor:
         self.model = joblib.load(model_file)
         self.scaler = joblib.load(scaler_file)
         
+        # Model lama tanpa similarity index: jangan pakai index dari training sebelumnya
+        if os.path.exists(nn_index_file):
+            self.nn_index = joblib.load(nn_index_file)
+        else:
+            self.nn_index = None
+            print("⚠️  Similarity index not found, find_similar_locations needs train_model()")
+        
         print(f"📂 Model loaded from {model_file}")
         return True
 
@@ -1,7 +1,9 @@
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import os
 from dotenv import load_dotenv
+from database import DB_CONFIG, get_engine
 
 # Load environment variables
 load_dotenv()
@@ -9,25 +11,25 @@ load_dotenv()
 def create_database():
     """Create database"""
     try:
-        # Connect to PostgreSQL server
+        # Connect to PostgreSQL server (database belum tentu ada, jadi tidak lewat shared engine)
         conn = psycopg2.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            port=os.getenv('DB_PORT', '5432'),
-            user=os.getenv('DB_USER', 'myuser'),
-            password=os.getenv('DB_PASSWORD', 'postgres')
+            host=DB_CONFIG['host'],
+            port=DB_CONFIG['port'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password']
         )
         conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
         cursor = conn.cursor()
         
         # Check if database exists
-        db_name = os.getenv('DB_NAME', 'coffee_shop_db')
-        cursor.execute(f"SELECT 1 FROM pg_database WHERE datname = '{db_name}'")
+        db_name = DB_CONFIG['database']
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db_name,))
         
         if cursor.fetchone():
             print(f"✅ Database '{db_name}' already exists")
         else:
             # Create database
-            cursor.execute(f"CREATE DATABASE {db_name}")
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_name)))
             print(f"✅ Database '{db_name}' created successfully")
         
         cursor.close()
@@ -37,43 +39,39 @@ def create_database():
         print(f"❌ Database creation error: {e}")
         print("💡 Make sure PostgreSQL is running and credentials are correct")
 
-def create_tables():
+def create_tables(verbose=False):
     """Create tables dari schema file"""
     try:
         # Read schema file
         with open('database_schema.sql', 'r') as f:
             schema_sql = f.read()
         
-        # Connect to database
-        conn = psycopg2.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            port=os.getenv('DB_PORT', '5432'),
-            user=os.getenv('DB_USER', 'myuser'),
-            password=os.getenv('DB_PASSWORD', 'postgres'),
-            database=os.getenv('DB_NAME', 'coffee_shop_db')
-        )
-        cursor = conn.cursor()
-        
-        # Execute schema
-        cursor.execute(schema_sql)
-        conn.commit()
+        # Connect to database (raw connection dari shared engine pool)
+        conn = get_engine().raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                # Execute schema
+                cursor.execute(schema_sql)
+                
+                # Show created tables (opsional, extra round-trip ke server)
+                if verbose:
+                    cursor.execute("""
+                        SELECT table_name 
+                        FROM information_schema.tables 
+                        WHERE table_schema = 'public'
+                    """)
+                    tables = cursor.fetchall()
+            
+            conn.commit()
+        finally:
+            conn.close()
         
         print("✅ Tables created successfully")
         
-        # Show created tables
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public'
-        """)
-        tables = cursor.fetchall()
-        
-        print("📋 Created tables:")
-        for table in tables:
-            print(f"   - {table[0]}")
-        
-        cursor.close()
-        conn.close()
+        if verbose:
+            print("📋 Created tables:")
+            for table in tables:
+                print(f"   - {table[0]}")
         
     except Exception as e:
         print(f"❌ Table creation error: {e}")
@@ -81,13 +79,7 @@ def create_tables():
 def test_connection():
     """Test database connection"""
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            port=os.getenv('DB_PORT', '5432'),
-            user=os.getenv('DB_USER', 'postgres'),
-            password=os.getenv('DB_PASSWORD', 'password'),
-            database=os.getenv('DB_NAME', 'coffee_shop_db')
-        )
+        conn = get_engine().raw_connection()
         
         cursor = conn.cursor()
         cursor.execute("SELECT version();")